@@ -171,3 +171,16 @@ DATA_UPLOAD_MAX_MEMORY_SIZE = 200 * 1024 * 1024  # 200 MB total in memory
 DATABASES['default']['OPTIONS'] = {
     'timeout': 60,  # Increase SQLite timeout for bulk inserts
 }
+
+# Search planner guardrails: searches estimated to scan more rows than the
+# budget are rejected, and above the exact-count limit total_count is estimated
+SEARCH_COST_BUDGET = int(os.environ.get('SEARCH_COST_BUDGET', 5000000))
+SEARCH_EXACT_COUNT_LIMIT = int(os.environ.get('SEARCH_EXACT_COUNT_LIMIT', 100000))
+
+# Live tail subscriptions: how many may exist at once, matched event ids
+# buffered per subscription, seconds without a poll before a subscription is
+# dropped, and the longest a long-poll request (or SSE keep-alive interval) waits
+SUBSCRIPTION_MAX = int(os.environ.get('SUBSCRIPTION_MAX', 100))
+SUBSCRIPTION_BUFFER_SIZE = int(os.environ.get('SUBSCRIPTION_BUFFER_SIZE', 10000))
+SUBSCRIPTION_IDLE_TIMEOUT = int(os.environ.get('SUBSCRIPTION_IDLE_TIMEOUT', 300))
+SUBSCRIPTION_POLL_TIMEOUT = int(os.environ.get('SUBSCRIPTION_POLL_TIMEOUT', 25))
@@ -0,0 +1,251 @@
+import json
+import os
+import platform
+import resource
+import statistics
+import sys
+import tempfile
+import time
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import RequestFactory, override_settings
+from events.models import UploadedFile
+from events.synthetic import BASE_TIME, FlowLogGenerator
+from events.views import parse_and_save_events, search_events
+
+HOUR = 3600
+
+
+def representative_queries(generator):
+    """
+    Fixed search mix: hot and rare values, narrow and wide time windows
+    """
+    day = {'start_time': BASE_TIME, 'end_time': BASE_TIME + generator.duration + HOUR}
+    hour = {'start_time': BASE_TIME + HOUR, 'end_time': BASE_TIME + 2 * HOUR}
+    return {
+        'hot_srcaddr_day': {'srcaddr': generator.srcaddrs[0], **day},
+        'rare_srcaddr_day': {'srcaddr': generator.srcaddrs[-1], **day},
+        'hot_dstaddr_hour': {'dstaddr': generator.dstaddrs[0], **hour},
+        'dstport_hour': {'dstport': generator.dstports[0], **hour},
+        'account_day': {'account_id': generator.accounts[0], **day},
+        'reject_hour': {'action': 'REJECT', **hour},
+        'protocol_dstport_hour': {'protocol': 17, 'dstport': generator.dstports[1], **hour},
+    }
+
+
+def peak_rss_mb():
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if platform.system() == 'Darwin' else 1024), 1)
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark ingest and search on synthetic VPC flow logs in a throwaway "
+        "database and write the results as JSON"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows',
+            type=int,
+            nargs='+',
+            default=[1000000],
+            help="Table sizes to measure at; loading is incremental (e.g. 1000000 10000000 100000000)"
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--accounts', type=int, default=50, help="Distinct account ids")
+        parser.add_argument('--instances', type=int, default=500, help="Distinct instance ids")
+        parser.add_argument('--addresses', type=int, default=10000, help="Distinct src/dst addresses")
+        parser.add_argument('--ports', type=int, default=1000, help="Distinct destination ports")
+        parser.add_argument('--skew', type=float, default=1.0, help="Zipf exponent for value popularity (0 = uniform)")
+        parser.add_argument('--file-rows', type=int, default=100000, help="Rows per generated log file")
+        parser.add_argument('--repeat', type=int, default=50, help="Runs per search query")
+        parser.add_argument('--output', default='benchmark.json', help="Where to write the results")
+        parser.add_argument(
+            '--cost-budget',
+            type=int,
+            default=sys.maxsize,
+            help="SEARCH_COST_BUDGET for the run (default: unlimited, so no query is rejected)"
+        )
+        parser.add_argument(
+            '--exact-count-limit',
+            type=int,
+            default=sys.maxsize,
+            help="SEARCH_EXACT_COUNT_LIMIT for the run (default: unlimited, so counts are always exact)"
+        )
+        parser.add_argument('--baseline', help="Earlier results file to compare against")
+        parser.add_argument(
+            '--tolerance',
+            type=float,
+            default=0.2,
+            help="Allowed slowdown against the baseline before failing (default: 0.2 = 20%%)"
+        )
+
+    def handle(self, *args, **options):
+        sizes = sorted(options['rows'])
+        generator = FlowLogGenerator(
+            seed=options['seed'],
+            accounts=options['accounts'],
+            instances=options['instances'],
+            addresses=options['addresses'],
+            ports=options['ports'],
+            skew=options['skew'],
+        )
+        queries = representative_queries(generator)
+
+        with tempfile.TemporaryDirectory() as work_dir:
+            if connection.vendor == 'sqlite':
+                # The default SQLite test database is in memory; keep it on disk
+                connection.settings_dict['TEST']['NAME'] = os.path.join(work_dir, 'benchmark.sqlite3')
+            old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+            # Pin the planner limits so every size measures the same query paths
+            try:
+                with override_settings(
+                    SEARCH_COST_BUDGET=options['cost_budget'],
+                    SEARCH_EXACT_COUNT_LIMIT=options['exact_count_limit']
+                ):
+                    results = self.run_sizes(sizes, generator, queries, work_dir, options)
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        report = {
+            'meta': {
+                'seed': options['seed'],
+                'accounts': options['accounts'],
+                'instances': options['instances'],
+                'addresses': options['addresses'],
+                'ports': options['ports'],
+                'skew': options['skew'],
+                'repeat': options['repeat'],
+                'cost_budget': options['cost_budget'],
+                'exact_count_limit': options['exact_count_limit'],
+                'database': connection.vendor,
+                'python': platform.python_version(),
+                'django': django.get_version(),
+            },
+            'results': results,
+        }
+        with open(options['output'], 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
+
+        failed = [
+            f"{result['rows']} rows: {name} returned status {search['status']}"
+            for result in results
+            for name, search in result['searches'].items()
+            if search['status'] != 200
+        ]
+        if failed:
+            raise CommandError(
+                "Searches did not succeed, so their timings are not comparable:\n" + "\n".join(failed)
+            )
+
+        if options['baseline']:
+            self.compare(report, options['baseline'], options['tolerance'])
+
+    def run_sizes(self, sizes, generator, queries, work_dir, options):
+        results = []
+        loaded = 0
+        factory = RequestFactory()
+
+        for size in sizes:
+            # Rate for the rows added at this size only, so slowdown as the
+            # table grows is not averaged away by the earlier, smaller loads
+            size_start = loaded
+            ingest_time = 0.0
+            while loaded < size:
+                rows = min(options['file_rows'], size - loaded)
+                file_path = os.path.join(work_dir, f'flows_{loaded}.log')
+                generator.write(file_path, rows)
+                file_record = UploadedFile.objects.create(
+                    filename=os.path.basename(file_path),
+                    file_path=file_path,
+                    processing_status='processing'
+                )
+                start_time = time.perf_counter()
+                loaded += parse_and_save_events(file_path, file_record)
+                ingest_time += time.perf_counter() - start_time
+                os.remove(file_path)
+                self.stdout.write(f"Loaded {loaded}/{size} events")
+
+            searches = {}
+            for name, params in queries.items():
+                samples = []
+                for _ in range(options['repeat']):
+                    request = factory.post('/api/search/', params, content_type='application/json')
+                    start_time = time.perf_counter()
+                    response = search_events(request)
+                    samples.append((time.perf_counter() - start_time) * 1000)
+                searches[name] = {
+                    'status': response.status_code,
+                    'total_count': response.data.get('total_count'),
+                    'count_is_estimate': response.data.get('count_is_estimate'),
+                    'p50_ms': round(statistics.median(samples), 3),
+                    'p99_ms': round(percentile(samples, 0.99), 3),
+                }
+                self.stdout.write(
+                    f"  {name}: p50 {searches[name]['p50_ms']}ms, p99 {searches[name]['p99_ms']}ms"
+                )
+
+            results.append({
+                'rows': loaded,
+                'ingest_rows_per_sec': round((loaded - size_start) / ingest_time, 1) if ingest_time else None,
+                'searches': searches,
+                'peak_rss_mb': peak_rss_mb(),
+            })
+        return results
+
+    def compare(self, report, baseline_path, tolerance):
+        with open(baseline_path, encoding='utf-8') as file:
+            baseline = json.load(file)
+
+        baseline_results = {result['rows']: result for result in baseline['results']}
+        regressions = []
+        for result in report['results']:
+            previous = baseline_results.get(result['rows'])
+            if previous is None:
+                continue
+            if result['ingest_rows_per_sec'] is None or previous['ingest_rows_per_sec'] is None:
+                regressions.append(
+                    f"{result['rows']} rows: ingest not comparable "
+                    f"({result['ingest_rows_per_sec']} rows/sec, baseline {previous['ingest_rows_per_sec']})"
+                )
+            elif result['ingest_rows_per_sec'] < previous['ingest_rows_per_sec'] * (1 - tolerance):
+                regressions.append(
+                    f"{result['rows']} rows: ingest {result['ingest_rows_per_sec']} rows/sec "
+                    f"(baseline {previous['ingest_rows_per_sec']})"
+                )
+            for name, search in result['searches'].items():
+                old = previous['searches'].get(name)
+                if old is None:
+                    continue
+                if search['status'] != 200 or old['status'] != 200:
+                    regressions.append(
+                        f"{result['rows']} rows: {name} not comparable "
+                        f"(status {search['status']}, baseline {old['status']})"
+                    )
+                    continue
+                if search.get('count_is_estimate') != old.get('count_is_estimate'):
+                    regressions.append(
+                        f"{result['rows']} rows: {name} not comparable "
+                        f"(count_is_estimate {search.get('count_is_estimate')}, "
+                        f"baseline {old.get('count_is_estimate')})"
+                    )
+                    continue
+                for metric in ['p50_ms', 'p99_ms']:
+                    if search[metric] > old[metric] * (1 + tolerance):
+                        regressions.append(
+                            f"{result['rows']} rows: {name} {metric} {search[metric]} "
+                            f"(baseline {old[metric]})"
+                        )
+
+        if regressions:
+            raise CommandError("Performance regressions:\n" + "\n".join(regressions))
+        self.stdout.write(self.style.SUCCESS(f"No regressions against {baseline_path}"))
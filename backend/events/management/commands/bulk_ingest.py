@@ -0,0 +1,140 @@
+import os
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from events.models import Event, UploadedFile
+from events.planner import update_statistics
+from events.views import iter_events
+
+STAGING_TABLE = 'events_event_staging'
+
+
+class Command(BaseCommand):
+    help = (
+        "Bulk load every event file in a directory: rows go into an unindexed "
+        "staging table inside one transaction and are merged into Event sorted "
+        "by starttime at the end"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory', help="Directory containing event log files")
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=10000,
+            help="Rows per staging insert (default: 10000)"
+        )
+        parser.add_argument(
+            '--rebuild-indexes',
+            action='store_true',
+            help="Drop Event indexes before the merge and rebuild them afterwards "
+                 "(faster when the load is large relative to the existing table)"
+        )
+
+    def stage(self, cursor, insert_sql, fields, events):
+        cursor.executemany(insert_sql, [
+            [field.get_db_prep_save(getattr(event, field.attname), connection) for field in fields]
+            for event in events
+        ])
+        update_statistics(events)
+        return len(events)
+
+    def handle(self, *args, **options):
+        directory = options['directory']
+        if not os.path.isdir(directory):
+            raise CommandError(f"{directory} is not a directory")
+
+        file_names = sorted(
+            name for name in os.listdir(directory)
+            if os.path.isfile(os.path.join(directory, name))
+        )
+        if not file_names:
+            raise CommandError(f"No files found in {directory}")
+
+        start_time = time.time()
+        fields = [field for field in Event._meta.concrete_fields if not field.primary_key]
+        columns = ', '.join(connection.ops.quote_name(field.column) for field in fields)
+        placeholders = ', '.join(['%s'] * len(fields))
+        event_table = connection.ops.quote_name(Event._meta.db_table)
+        staging_table = connection.ops.quote_name(STAGING_TABLE)
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {staging_table}")
+            cursor.execute(
+                f"CREATE TEMPORARY TABLE {staging_table} AS "
+                f"SELECT {columns} FROM {event_table} WHERE 1 = 0"
+            )
+            insert_sql = f"INSERT INTO {staging_table} ({columns}) VALUES ({placeholders})"
+
+            file_records = []
+            skipped_records = []
+            for name in file_names:
+                file_path = os.path.join(directory, name)
+                file_record = UploadedFile.objects.create(
+                    filename=name,
+                    file_path=os.path.abspath(file_path),
+                    processing_status='processing'
+                )
+                events_count = 0
+                events_batch = []
+                try:
+                    for event in iter_events(file_path, file_record):
+                        events_batch.append(event)
+                        if len(events_batch) >= options['batch_size']:
+                            events_count += self.stage(cursor, insert_sql, fields, events_batch)
+                            events_batch = []
+                    if events_batch:
+                        events_count += self.stage(cursor, insert_sql, fields, events_batch)
+                except Exception as e:
+                    raise CommandError(f"Error parsing file {name}: {str(e)}")
+
+                file_record.total_events = events_count
+                if not events_count:
+                    # Not an event log (e.g. a stray README); record the failure
+                    skipped_records.append(file_record)
+                    self.stderr.write(f"No events found in {name}, marking it failed")
+                    continue
+                file_records.append(file_record)
+                self.stdout.write(f"Staged {events_count} events from {name}")
+
+            load_time = time.time() - start_time
+
+            # Index DDL is issued directly: SQLite refuses to open a schema
+            # editor inside the surrounding transaction
+            indexes = Event._meta.indexes if options['rebuild_indexes'] else []
+            schema_editor = connection.schema_editor()
+            for index in indexes:
+                cursor.execute(str(index.remove_sql(Event, schema_editor)))
+
+            # Appending in starttime order keeps the starttime-led index
+            # inserts mostly at the right edge of each b-tree
+            cursor.execute(
+                f"INSERT INTO {event_table} ({columns}) "
+                f"SELECT {columns} FROM {staging_table} "
+                f"ORDER BY {connection.ops.quote_name('starttime')}"
+            )
+            merged = cursor.rowcount
+
+            for index in indexes:
+                cursor.execute(str(index.create_sql(Event, schema_editor)))
+
+            cursor.execute(f"DROP TABLE {staging_table}")
+
+            for file_record in file_records:
+                file_record.processing_status = 'completed'
+                file_record.save()
+            for file_record in skipped_records:
+                file_record.processing_status = 'failed'
+                file_record.save()
+
+        total_time = time.time() - start_time
+        self.stdout.write(self.style.SUCCESS(
+            f"Loaded {merged} events from {len(file_records)} files in {total_time:.1f}s "
+            f"(staging {load_time:.1f}s, merge {total_time - load_time:.1f}s, "
+            f"{merged / total_time if total_time else 0:.0f} rows/sec)"
+        ))
+        if skipped_records:
+            self.stdout.write(self.style.WARNING(
+                f"Skipped {len(skipped_records)} files without events: "
+                + ", ".join(file_record.filename for file_record in skipped_records)
+            ))
@@ -0,0 +1,46 @@
+import os
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from events.models import Account, ColumnStatistic, Event, Instance, UploadedFile
+
+
+class Command(BaseCommand):
+    help = "Report on-disk bytes per event for the Event table, its indexes, dictionaries and planner statistics"
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError("Storage stats need SQLite's dbstat table")
+
+        tables = [model._meta.db_table for model in (Event, Account, Instance, ColumnStatistic)]
+        with connection.cursor() as cursor:
+            placeholders = ', '.join(['%s'] * len(tables))
+            cursor.execute(
+                f"SELECT name FROM sqlite_master WHERE tbl_name IN ({placeholders})",
+                tables
+            )
+            objects = [row[0] for row in cursor.fetchall()]
+            placeholders = ', '.join(['%s'] * len(objects))
+            cursor.execute(
+                f"SELECT name, SUM(pgsize) FROM dbstat WHERE name IN ({placeholders}) "
+                "GROUP BY name ORDER BY 2 DESC",
+                objects
+            )
+            sizes = cursor.fetchall()
+
+        events_count = Event.objects.count()
+        total_bytes = sum(size for _, size in sizes)
+        for name, size in sizes:
+            self.stdout.write(f"{name:<40} {size:>14,} bytes")
+        self.stdout.write(f"{'total':<40} {total_bytes:>14,} bytes")
+        self.stdout.write(f"events: {events_count:,}")
+        if events_count:
+            self.stdout.write(f"bytes per event: {total_bytes / events_count:.1f}")
+
+        raw_bytes = 0
+        for file_path in UploadedFile.objects.values_list('file_path', flat=True):
+            full_path = os.path.join(settings.MEDIA_ROOT, file_path)
+            if file_path and os.path.exists(full_path):
+                raw_bytes += os.path.getsize(full_path)
+        if raw_bytes:
+            self.stdout.write(f"raw log bytes: {raw_bytes:,} ({total_bytes / raw_bytes:.2f}x)")
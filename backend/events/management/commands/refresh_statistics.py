@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from events.planner import rebuild_statistics
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the search planner's column histograms from the Event table "
+        "(run after deleting uploaded files or events)"
+    )
+
+    def handle(self, *args, **options):
+        rows = rebuild_statistics()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rows} histogram entries"))
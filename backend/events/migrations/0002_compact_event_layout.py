@@ -0,0 +1,219 @@
+from django.core.management.color import no_style
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+ACTION_CODES = {'ACCEPT': 1, 'REJECT': 2}
+LOG_STATUS_CODES = {'OK': 1, 'NODATA': 2, 'SKIPDATA': 3}
+
+
+def _case(column, codes):
+    # Unknown strings fall back to the 0 ('-') code
+    whens = ' '.join(f"WHEN '{value}' THEN {code}" for value, code in codes.items())
+    return f"CASE UPPER({column}) {whens} ELSE 0 END"
+
+
+def copy_events(apps, schema_editor):
+    """
+    Fill the dictionaries, then copy every event into the compact table with a
+    single INSERT ... SELECT so large tables are neither loaded into Python
+    nor rewritten once per altered column.
+    """
+    Account = apps.get_model('events', 'Account')
+    Instance = apps.get_model('events', 'Instance')
+    Event = apps.get_model('events', 'Event')
+    CompactEvent = apps.get_model('events', 'CompactEvent')
+    UploadedFile = apps.get_model('events', 'UploadedFile')
+
+    Account.objects.bulk_create(
+        (Account(value=value) for value in Event.objects.values_list('account_id', flat=True).distinct()),
+        batch_size=1000
+    )
+    Instance.objects.bulk_create(
+        (Instance(value=value) for value in Event.objects.values_list('instance_id', flat=True).distinct()),
+        batch_size=1000
+    )
+    # Files without an UploadedFile row get one
+    known_files = set(UploadedFile.objects.values_list('filename', flat=True))
+    UploadedFile.objects.bulk_create(
+        (
+            UploadedFile(filename=filename, file_path='', processing_status='completed')
+            for filename in Event.objects.values_list('source_file', flat=True).distinct()
+            if filename not in known_files
+        ),
+        batch_size=1000
+    )
+
+    quote = schema_editor.quote_name
+    # Ids are kept so existing links to events stay valid
+    columns = [
+        'id', 'serialno', 'version', 'srcaddr', 'dstaddr', 'srcport', 'dstport',
+        'protocol', 'packets', 'bytes', 'starttime', 'endtime'
+    ]
+    schema_editor.execute(
+        f"INSERT INTO {quote(CompactEvent._meta.db_table)} "
+        f"({', '.join(quote(column) for column in columns)}, "
+        f"{quote('account_id')}, {quote('instance_id')}, {quote('action')}, "
+        f"{quote('log_status')}, {quote('source_file_id')}) "
+        f"SELECT {', '.join('e.' + quote(column) for column in columns)}, a.{quote('id')}, i.{quote('id')}, "
+        f"{_case('e.' + quote('action'), ACTION_CODES)}, "
+        f"{_case('e.' + quote('log_status'), LOG_STATUS_CODES)}, "
+        # Duplicate filenames attach to the most recent upload
+        f"(SELECT f.{quote('id')} FROM {quote(UploadedFile._meta.db_table)} f "
+        f"WHERE f.{quote('filename')} = e.{quote('source_file')} "
+        f"ORDER BY f.{quote('upload_date')} DESC, f.{quote('id')} DESC LIMIT 1) "
+        f"FROM {quote(Event._meta.db_table)} e "
+        f"JOIN {quote(Account._meta.db_table)} a ON a.{quote('value')} = e.{quote('account_id')} "
+        f"JOIN {quote(Instance._meta.db_table)} i ON i.{quote('value')} = e.{quote('instance_id')} "
+        f"ORDER BY e.{quote('id')}"
+    )
+    for sql in schema_editor.connection.ops.sequence_reset_sql(no_style(), [CompactEvent]):
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("events", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Account",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("value", models.CharField(max_length=50, unique=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="Instance",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("value", models.CharField(max_length=50, unique=True)),
+            ],
+        ),
+        # The new layout is built as a separate table and swapped in: altering
+        # the old table column by column would rebuild it once per column on
+        # SQLite. Indexes are added after the copy.
+        migrations.CreateModel(
+            name="CompactEvent",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("serialno", models.IntegerField()),
+                ("version", models.PositiveSmallIntegerField()),
+                (
+                    "account",
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.PROTECT,
+                        related_name="events",
+                        to="events.account",
+                    ),
+                ),
+                (
+                    "instance",
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.PROTECT,
+                        related_name="events",
+                        to="events.instance",
+                    ),
+                ),
+                ("srcaddr", models.GenericIPAddressField()),
+                ("dstaddr", models.GenericIPAddressField()),
+                ("srcport", models.PositiveIntegerField()),
+                ("dstport", models.PositiveIntegerField()),
+                ("protocol", models.PositiveSmallIntegerField()),
+                ("packets", models.IntegerField()),
+                ("bytes", models.BigIntegerField()),
+                ("starttime", models.IntegerField()),
+                ("endtime", models.IntegerField()),
+                (
+                    "action",
+                    models.PositiveSmallIntegerField(
+                        choices=[(0, "-"), (1, "ACCEPT"), (2, "REJECT")]
+                    ),
+                ),
+                (
+                    "log_status",
+                    models.PositiveSmallIntegerField(
+                        choices=[(0, "-"), (1, "OK"), (2, "NODATA"), (3, "SKIPDATA")]
+                    ),
+                ),
+                (
+                    "source_file",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="events",
+                        to="events.uploadedfile",
+                    ),
+                ),
+            ],
+        ),
+        migrations.RunPython(copy_events, migrations.RunPython.noop),
+        migrations.DeleteModel(
+            name="Event",
+        ),
+        migrations.RenameModel(
+            old_name="CompactEvent",
+            new_name="Event",
+        ),
+        migrations.AddIndex(
+            model_name="event",
+            index=models.Index(
+                fields=["starttime"], name="events_even_startti_03fd26_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="event",
+            index=models.Index(
+                fields=["srcaddr", "starttime"],
+                name="events_even_srcaddr_c64d20_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="event",
+            index=models.Index(
+                fields=["dstaddr", "starttime"],
+                name="events_even_dstaddr_bbfda3_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="event",
+            index=models.Index(
+                fields=["dstport", "starttime"],
+                name="events_even_dstport_b051ce_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="event",
+            index=models.Index(
+                fields=["account", "starttime"],
+                name="events_even_account_ebb4a7_idx",
+            ),
+        ),
+    ]
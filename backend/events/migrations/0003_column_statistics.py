@@ -0,0 +1,77 @@
+# Generated by Django 4.2.7 on 2026-10-19 19:10
+
+import hashlib
+from collections import Counter
+from django.db import migrations, models
+from django.db.models import Count, F
+
+# Frozen copy of the planner's histogram layout at the time of this migration;
+# later layout changes are picked up with the refresh_statistics command
+TIME_BUCKET = 3600
+HISTOGRAM_COLUMNS = ['account_id', 'dstport', 'protocol', 'action', 'log_status']
+BUCKETED_COLUMNS = ['srcaddr', 'dstaddr', 'srcport']
+HISTOGRAM_BUCKETS = 1024
+
+
+def bucket_key(value):
+    # Addresses are stored normalized, so the stored text hashes as at ingest
+    digest = hashlib.blake2b(str(value).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'big') % HISTOGRAM_BUCKETS
+
+
+def build_statistics(apps, schema_editor):
+    """
+    Seed the histograms from events loaded before statistics were maintained
+    """
+    Event = apps.get_model('events', 'Event')
+    ColumnStatistic = apps.get_model('events', 'ColumnStatistic')
+
+    rows = []
+    buckets = (
+        Event.objects.annotate(bucket=F('starttime') / TIME_BUCKET * TIME_BUCKET)
+        .values_list('bucket')
+        .annotate(row_count=Count('id'))
+        .order_by()
+    )
+    rows.extend(('starttime', value, row_count) for value, row_count in buckets)
+    for column in HISTOGRAM_COLUMNS:
+        values = Event.objects.values_list(column).annotate(row_count=Count('id')).order_by()
+        rows.extend((column, value, row_count) for value, row_count in values)
+    for column in BUCKETED_COLUMNS:
+        counts = Counter()
+        values = Event.objects.values_list(column).annotate(row_count=Count('id')).order_by()
+        for value, row_count in values:
+            counts[bucket_key(value)] += row_count
+        rows.extend((column, value, row_count) for value, row_count in counts.items())
+
+    ColumnStatistic.objects.bulk_create(
+        (
+            ColumnStatistic(column_name=column, value=value, row_count=row_count)
+            for column, value, row_count in rows
+        ),
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0002_compact_event_layout'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ColumnStatistic',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('column_name', models.CharField(max_length=20)),
+                ('value', models.BigIntegerField()),
+                ('row_count', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='columnstatistic',
+            constraint=models.UniqueConstraint(fields=('column_name', 'value'), name='unique_column_statistic'),
+        ),
+        migrations.RunPython(build_statistics, migrations.RunPython.noop),
+    ]
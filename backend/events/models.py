@@ -1,38 +1,66 @@
 from django.db import models
 
 
+class Account(models.Model):
+    """Dictionary entry for an account id; events store the integer key."""
+    value = models.CharField(max_length=50, unique=True)
+
+    def __str__(self):
+        return self.value
+
+
+class Instance(models.Model):
+    """Dictionary entry for an instance/interface id; events store the integer key."""
+    value = models.CharField(max_length=50, unique=True)
+
+    def __str__(self):
+        return self.value
+
+
 class Event(models.Model):
+    class Action(models.IntegerChoices):
+        NONE = 0, '-'
+        ACCEPT = 1, 'ACCEPT'
+        REJECT = 2, 'REJECT'
+
+    class LogStatus(models.IntegerChoices):
+        NONE = 0, '-'
+        OK = 1, 'OK'
+        NODATA = 2, 'NODATA'
+        SKIPDATA = 3, 'SKIPDATA'
+
     serialno = models.IntegerField()
-    version = models.IntegerField()
-    account_id = models.CharField(max_length=50, db_index=True)
-    instance_id = models.CharField(max_length=50, db_index=True)
-    srcaddr = models.GenericIPAddressField(db_index=True)
-    dstaddr = models.GenericIPAddressField(db_index=True)
-    srcport = models.IntegerField(db_index=True)
-    dstport = models.IntegerField(db_index=True)
-    protocol = models.IntegerField(db_index=True)
+    version = models.PositiveSmallIntegerField()
+    # Covered by the (account, starttime) index below
+    account = models.ForeignKey(Account, on_delete=models.PROTECT, db_index=False, related_name='events')
+    instance = models.ForeignKey(Instance, on_delete=models.PROTECT, db_index=False, related_name='events')
+    srcaddr = models.GenericIPAddressField()
+    dstaddr = models.GenericIPAddressField()
+    srcport = models.PositiveIntegerField()
+    dstport = models.PositiveIntegerField()
+    protocol = models.PositiveSmallIntegerField()
     packets = models.IntegerField()
     bytes = models.BigIntegerField()
-    starttime = models.IntegerField(db_index=True)  # epoch timestamp
-    endtime = models.IntegerField(db_index=True)    # epoch timestamp
-    action = models.CharField(max_length=10, db_index=True)
-    log_status = models.CharField(max_length=10)
-    source_file = models.CharField(max_length=255)  # Track which file this event came from
-    
-    created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True)
-    
+    starttime = models.IntegerField()  # epoch timestamp
+    endtime = models.IntegerField()    # epoch timestamp
+    action = models.PositiveSmallIntegerField(choices=Action.choices)
+    log_status = models.PositiveSmallIntegerField(choices=LogStatus.choices)
+    source_file = models.ForeignKey('UploadedFile', on_delete=models.CASCADE, related_name='events')  # Track which file this event came from
+
     class Meta:
+        # Every search carries a time range and orders by -starttime, so each
+        # index ends in starttime; action/protocol/srcport filters ride on the
+        # plain starttime index.
         indexes = [
+            models.Index(fields=['starttime']),
             models.Index(fields=['srcaddr', 'starttime']),
             models.Index(fields=['dstaddr', 'starttime']),
-            models.Index(fields=['action', 'starttime']),
-            models.Index(fields=['account_id', 'starttime']),
-            models.Index(fields=['starttime', 'endtime']),
+            models.Index(fields=['dstport', 'starttime']),
+            models.Index(fields=['account', 'starttime']),
         ]
-    
+
     def __str__(self):
-        return f"Event {self.serialno}: {self.srcaddr} -> {self.dstaddr} | {self.action}"
+        return f"Event {self.serialno}: {self.srcaddr} -> {self.dstaddr} | {self.get_action_display()}"
 
 
 class UploadedFile(models.Model):
@@ -50,6 +78,25 @@ class UploadedFile(models.Model):
         ],
         default='pending'
     )
-    
+
     def __str__(self):
         return f"{self.filename} - {self.processing_status}"
+
+
+class ColumnStatistic(models.Model):
+    """
+    Per-column value histogram over Event, maintained at ingest time and read
+    by the search planner. starttime is bucketed by hour, the other columns
+    hold their stored value.
+    """
+    column_name = models.CharField(max_length=20)
+    value = models.BigIntegerField()
+    row_count = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['column_name', 'value'], name='unique_column_statistic'),
+        ]
+
+    def __str__(self):
+        return f"{self.column_name}={self.value}: {self.row_count}"
@@ -0,0 +1,212 @@
+import hashlib
+from collections import Counter
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, F, Sum
+from .models import Account, ColumnStatistic, Event
+
+TIME_BUCKET = 3600  # seconds per starttime histogram bucket
+
+# Columns with a value histogram; account is stored by dictionary key
+HISTOGRAM_COLUMNS = ['account_id', 'dstport', 'protocol', 'action', 'log_status']
+
+# Addresses and ephemeral source ports have too many distinct values for an
+# exact histogram, so they are counted per bucket_key() hash bucket instead,
+# keeping the table a fixed size. Values sharing a bucket are overestimated,
+# never under.
+BUCKETED_COLUMNS = ['srcaddr', 'dstaddr', 'srcport']
+HISTOGRAM_BUCKETS = 1024
+
+# Access paths the planner can pick, keyed by the index's leading column
+INDEX_NAMES = {
+    index.fields[0]: index.name for index in Event._meta.indexes
+}
+
+
+def matching_codes(choices, term):
+    """
+    Codes whose label contains term, keeping the old icontains semantics
+    """
+    term = term.strip().upper()
+    return [code for code, label in choices.choices if term in label]
+
+
+def normalize_address(address):
+    """
+    Address as GenericIPAddressField stores and compares it (IPv6 compressed
+    and lower case), so in-memory events match what search_events sees
+    """
+    return Event._meta.get_field('srcaddr').get_prep_value(address)
+
+
+def bucket_key(value):
+    """
+    Histogram bucket for a value of a BUCKETED_COLUMNS column (addresses
+    normalized)
+    """
+    digest = hashlib.blake2b(str(value).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'big') % HISTOGRAM_BUCKETS
+
+
+def update_statistics(events):
+    """
+    Add a batch of events to the column histograms
+    """
+    counts = Counter()
+    for event in events:
+        counts[('starttime', event.starttime // TIME_BUCKET * TIME_BUCKET)] += 1
+        for column in HISTOGRAM_COLUMNS:
+            counts[(column, getattr(event, column))] += 1
+        for column in BUCKETED_COLUMNS:
+            counts[(column, bucket_key(getattr(event, column)))] += 1
+
+    if not counts:
+        return
+
+    quote = connection.ops.quote_name
+    table = quote(ColumnStatistic._meta.db_table)
+    # One transaction for the batch; in autocommit every upsert would commit
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.executemany(
+            f"INSERT INTO {table} ({quote('column_name')}, {quote('value')}, {quote('row_count')}) "
+            f"VALUES (%s, %s, %s) "
+            f"ON CONFLICT ({quote('column_name')}, {quote('value')}) "
+            f"DO UPDATE SET {quote('row_count')} = {table}.{quote('row_count')} + excluded.{quote('row_count')}",
+            [(column, value, count) for (column, value), count in counts.items()]
+        )
+
+
+def rebuild_statistics():
+    """
+    Recompute every histogram from the event table, replacing the current
+    counts. Ingest only ever adds to the histograms, so this is how they are
+    brought back in line after events are deleted.
+    """
+    rows = []
+    buckets = (
+        Event.objects.annotate(bucket=F('starttime') / TIME_BUCKET * TIME_BUCKET)
+        .values_list('bucket')
+        .annotate(row_count=Count('id'))
+        .order_by()
+    )
+    rows.extend(('starttime', value, row_count) for value, row_count in buckets)
+    for column in HISTOGRAM_COLUMNS:
+        values = Event.objects.values_list(column).annotate(row_count=Count('id')).order_by()
+        rows.extend((column, value, row_count) for value, row_count in values)
+    for column in BUCKETED_COLUMNS:
+        counts = Counter()
+        values = Event.objects.values_list(column).annotate(row_count=Count('id')).order_by()
+        for value, row_count in values:
+            counts[bucket_key(value)] += row_count
+        rows.extend((column, value, row_count) for value, row_count in counts.items())
+
+    with transaction.atomic():
+        ColumnStatistic.objects.all().delete()
+        ColumnStatistic.objects.bulk_create(
+            (
+                ColumnStatistic(column_name=column, value=value, row_count=row_count)
+                for column, value, row_count in rows
+            ),
+            batch_size=1000
+        )
+    return len(rows)
+
+
+def _histogram_rows(column, values):
+    stats = ColumnStatistic.objects.filter(column_name=column, value__in=values)
+    return stats.aggregate(rows=Sum('row_count'))['rows'] or 0
+
+
+def _time_range_rows(start_time, end_time):
+    """
+    Rows whose starttime bucket overlaps the range, pro-rating the edge buckets
+    """
+    first_bucket = start_time // TIME_BUCKET * TIME_BUCKET
+    last_bucket = end_time // TIME_BUCKET * TIME_BUCKET
+    if last_bucket - first_bucket > TIME_BUCKET:
+        rows = ColumnStatistic.objects.filter(
+            column_name='starttime',
+            value__gt=first_bucket,
+            value__lt=last_bucket
+        ).aggregate(rows=Sum('row_count'))['rows'] or 0
+    else:
+        rows = 0
+    edges = ColumnStatistic.objects.filter(
+        column_name='starttime',
+        value__in={first_bucket, last_bucket}
+    ).values_list('value', 'row_count')
+    for bucket, count in edges:
+        overlap = min(bucket + TIME_BUCKET, end_time) - max(bucket, start_time)
+        rows += count * max(overlap, 0) / TIME_BUCKET
+    return rows
+
+
+def plan_search(search_params):
+    """
+    Estimate result rows and scan cost for a search from the column histograms.
+
+    Predicates are assumed independent. The cost of each usable index is the
+    rows it would visit (its equality match narrowed by the time range); the
+    cheapest one is reported as the access path.
+    """
+    total_rows = ColumnStatistic.objects.filter(column_name='starttime').aggregate(
+        rows=Sum('row_count')
+    )['rows'] or 0
+    if not total_rows:
+        return {
+            'index': INDEX_NAMES['starttime'],
+            'estimated_rows': 0,
+            'estimated_cost': 0,
+            'total_rows': 0,
+        }
+
+    time_rows = _time_range_rows(search_params['start_time'], search_params['end_time'])
+    time_selectivity = time_rows / total_rows
+
+    selectivities = {}
+    if search_params.get('account_id'):
+        account_ids = list(
+            Account.objects.filter(value__icontains=search_params['account_id'])
+            .values_list('id', flat=True)
+        )
+        selectivities['account'] = _histogram_rows('account_id', account_ids) / total_rows
+    for column in ['srcaddr', 'dstaddr']:
+        if search_params.get(column):
+            key = bucket_key(normalize_address(search_params[column]))
+            selectivities[column] = _histogram_rows(column, [key]) / total_rows
+    if search_params.get('srcport'):
+        key = bucket_key(search_params['srcport'])
+        selectivities['srcport'] = _histogram_rows('srcport', [key]) / total_rows
+    for column in ['dstport', 'protocol']:
+        if search_params.get(column):
+            selectivities[column] = _histogram_rows(column, [search_params[column]]) / total_rows
+    if search_params.get('action'):
+        codes = matching_codes(Event.Action, search_params['action'])
+        selectivities['action'] = _histogram_rows('action', codes) / total_rows
+    if search_params.get('log_status'):
+        codes = matching_codes(Event.LogStatus, search_params['log_status'])
+        selectivities['log_status'] = _histogram_rows('log_status', codes) / total_rows
+
+    estimated_rows = time_rows
+    for selectivity in selectivities.values():
+        estimated_rows *= selectivity
+
+    index, cost = INDEX_NAMES['starttime'], time_rows
+    for column, selectivity in selectivities.items():
+        if column in INDEX_NAMES and total_rows * selectivity * time_selectivity < cost:
+            index, cost = INDEX_NAMES[column], total_rows * selectivity * time_selectivity
+
+    return {
+        'index': index,
+        'estimated_rows': round(estimated_rows),
+        'estimated_cost': round(cost),
+        'total_rows': total_rows,
+    }
+
+
+def exceeds_budget(plan):
+    return plan['estimated_cost'] > settings.SEARCH_COST_BUDGET
+
+
+def use_approximate_count(plan):
+    return plan['estimated_rows'] > settings.SEARCH_EXACT_COUNT_LIMIT
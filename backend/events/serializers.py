@@ -3,9 +3,21 @@ from .models import Event, UploadedFile
 
 
 class EventSerializer(serializers.ModelSerializer):
+    # Decode dictionary/choice columns back to the strings found in the logs
+    account_id = serializers.CharField(source='account.value')
+    instance_id = serializers.CharField(source='instance.value')
+    action = serializers.CharField(source='get_action_display')
+    log_status = serializers.CharField(source='get_log_status_display')
+    source_file = serializers.CharField(source='source_file.filename')
+
     class Meta:
         model = Event
-        fields = '__all__'
+        fields = [
+            'id', 'serialno', 'version', 'account_id', 'instance_id',
+            'srcaddr', 'dstaddr', 'srcport', 'dstport', 'protocol',
+            'packets', 'bytes', 'starttime', 'endtime', 'action',
+            'log_status', 'source_file'
+        ]
 
 
 class UploadedFileSerializer(serializers.ModelSerializer):
@@ -54,8 +66,16 @@ class SearchRequestSerializer(serializers.Serializer):
         return data
 
 
+class SubscriptionRequestSerializer(SearchRequestSerializer):
+    # Live tail watches new events, so the time range is optional here
+    start_time = serializers.IntegerField(required=False, help_text="Start time in epoch format")
+    end_time = serializers.IntegerField(required=False, help_text="End time in epoch format")
+
+
 class SearchResponseSerializer(serializers.Serializer):
     events = EventSerializer(many=True)
     total_count = serializers.IntegerField()
     search_time = serializers.FloatField()
     files_searched = serializers.ListField(child=serializers.CharField())
+    count_is_estimate = serializers.BooleanField()
+    plan = serializers.DictField()
@@ -0,0 +1,153 @@
+import threading
+import time
+import uuid
+from collections import deque
+from django.conf import settings
+from django.db.models import Max
+from .models import Account, Event
+from .planner import matching_codes, normalize_address
+
+# In-process registry: subscriptions only see events uploaded through the same
+# server process (true for runserver and a single gunicorn worker), not
+# events loaded by bulk_ingest
+_subscriptions = {}
+_condition = threading.Condition()
+
+
+class SubscriptionLimitReached(Exception):
+    pass
+
+
+class Subscription:
+    """
+    A registered search filter plus the ids of matching events not yet
+    acknowledged by the client
+    """
+
+    def __init__(self, filters, high_water_mark):
+        self.id = uuid.uuid4().hex
+        self.filters = dict(filters)
+        for column in ['srcaddr', 'dstaddr']:
+            if filters.get(column):
+                self.filters[column] = normalize_address(filters[column])
+        self.high_water_mark = high_water_mark
+        self.pending = deque(maxlen=settings.SUBSCRIPTION_BUFFER_SIZE)
+        self.dropped = 0
+        self.last_seen = time.monotonic()
+        self.account_term = filters.get('account_id', '').lower()
+        self.action_codes = (
+            matching_codes(Event.Action, filters['action']) if filters.get('action') else None
+        )
+        self.log_status_codes = (
+            matching_codes(Event.LogStatus, filters['log_status']) if filters.get('log_status') else None
+        )
+
+    def matches(self, event, account_values):
+        """
+        Same predicates as search_events, evaluated on an in-memory Event
+        """
+        filters = self.filters
+        if self.account_term and self.account_term not in account_values.get(event.account_id, ''):
+            return False
+        for column in ['srcaddr', 'dstaddr', 'srcport', 'dstport', 'protocol']:
+            if filters.get(column) and getattr(event, column) != filters[column]:
+                return False
+        if self.action_codes is not None and event.action not in self.action_codes:
+            return False
+        if self.log_status_codes is not None and event.log_status not in self.log_status_codes:
+            return False
+        if filters.get('start_time') and event.starttime < filters['start_time']:
+            return False
+        if filters.get('end_time') and event.endtime > filters['end_time']:
+            return False
+        return True
+
+
+def _expire_idle():
+    """
+    Drop subscriptions nobody has polled recently; call with _condition held
+    """
+    now = time.monotonic()
+    for subscription_id, subscription in list(_subscriptions.items()):
+        if now - subscription.last_seen > settings.SUBSCRIPTION_IDLE_TIMEOUT:
+            del _subscriptions[subscription_id]
+
+
+def register(filters):
+    """
+    Start watching for new events matching filters, from the current last event id
+    """
+    with _condition:
+        _expire_idle()
+        if len(_subscriptions) >= settings.SUBSCRIPTION_MAX:
+            raise SubscriptionLimitReached(
+                f"Too many live subscriptions ({settings.SUBSCRIPTION_MAX}); try again later"
+            )
+        # Read under the lock publish() matches under: a committed batch is
+        # either below the mark or published after the subscription is added
+        high_water_mark = Event.objects.aggregate(Max('id'))['id__max'] or 0
+        subscription = Subscription(filters, high_water_mark)
+        _subscriptions[subscription.id] = subscription
+    return subscription
+
+
+def unregister(subscription_id):
+    with _condition:
+        subscription = _subscriptions.pop(subscription_id, None)
+        _condition.notify_all()
+    return subscription is not None
+
+
+def get(subscription_id):
+    with _condition:
+        _expire_idle()
+        return _subscriptions.get(subscription_id)
+
+
+def publish(events):
+    """
+    Match a committed batch of events against every subscription
+    """
+    with _condition:
+        _expire_idle()
+        if not _subscriptions:
+            return
+
+        account_values = {}
+        if any(subscription.filters.get('account_id') for subscription in _subscriptions.values()):
+            account_values = dict(
+                Account.objects.filter(id__in={event.account_id for event in events})
+                .values_list('id', 'value')
+            )
+            # Filters compare case-insensitively, like icontains in search_events
+            account_values = {key: value.lower() for key, value in account_values.items()}
+
+        for subscription in _subscriptions.values():
+            for event in events:
+                if event.pk is None or event.pk <= subscription.high_water_mark:
+                    continue
+                if subscription.matches(event, account_values):
+                    if len(subscription.pending) == subscription.pending.maxlen:
+                        subscription.dropped += 1
+                    subscription.pending.append(event.pk)
+        _condition.notify_all()
+
+
+def wait_for_events(subscription, after, timeout, limit=1000):
+    """
+    Acknowledge ids up to after, then block until newer matches arrive or
+    timeout passes. Returns the pending ids (oldest first, at most limit).
+    """
+    deadline = time.monotonic() + timeout
+    with _condition:
+        while True:
+            if after is not None and after > subscription.high_water_mark:
+                subscription.high_water_mark = after
+            while subscription.pending and subscription.pending[0] <= subscription.high_water_mark:
+                subscription.pending.popleft()
+            subscription.last_seen = time.monotonic()
+
+            remaining = deadline - time.monotonic()
+            if subscription.pending or remaining <= 0 or subscription.id not in _subscriptions:
+                return list(subscription.pending)[:limit]
+            _condition.wait(remaining)
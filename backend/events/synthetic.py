@@ -0,0 +1,75 @@
+import itertools
+import random
+
+BASE_TIME = 1725850000  # epoch start of generated traffic
+PROTOCOLS = [6, 17, 1]  # TCP, UDP, ICMP
+SERVICE_PORTS = [443, 80, 22, 53, 3306, 5432, 8080, 25, 123, 3389]
+
+
+def _zipf_weights(count, skew):
+    """
+    Cumulative weights where rank r is drawn with probability ~ 1 / r**skew
+    (skew 0 is uniform)
+    """
+    return list(itertools.accumulate(1 / (rank ** skew) for rank in range(1, count + 1)))
+
+
+def _address(index, prefix):
+    return f"{prefix}.{index // 65536 % 256}.{index // 256 % 256}.{index % 256}"
+
+
+class FlowLogGenerator:
+    """
+    Deterministic generator of VPC flow-log lines in the headerless,
+    pipe-delimited format accepted by parse_and_save_events.
+
+    The same seed and parameters always produce the same lines. Accounts,
+    instances, addresses and destination ports are drawn from fixed-size
+    pools with a Zipf skew, so a few values are hot and most are rare.
+    """
+
+    def __init__(self, seed=0, accounts=50, instances=500, addresses=10000,
+                 ports=1000, skew=1.0, duration=86400):
+        self.random = random.Random(seed)
+        self.accounts = [str(100000000 + i * 7919) for i in range(accounts)]
+        self.instances = [f"eni-{200000000 + i * 104729}" for i in range(instances)]
+        self.srcaddrs = [_address(i, 10) for i in range(addresses)]
+        self.dstaddrs = [_address(i, 172) for i in range(addresses)]
+        self.dstports = (SERVICE_PORTS + list(range(1024, 1024 + ports)))[:ports]
+        self.duration = duration
+        self.account_weights = _zipf_weights(len(self.accounts), skew)
+        self.instance_weights = _zipf_weights(len(self.instances), skew)
+        self.address_weights = _zipf_weights(addresses, skew)
+        self.port_weights = _zipf_weights(len(self.dstports), skew)
+        self.serialno = 0
+
+    def _pick(self, values, weights):
+        return self.random.choices(values, cum_weights=weights)[0]
+
+    def line(self):
+        self.serialno += 1
+        starttime = BASE_TIME + self.random.randrange(self.duration)
+        packets = self.random.randint(1, 100)
+        return "|".join(str(value) for value in [
+            self.serialno,
+            2,
+            self._pick(self.accounts, self.account_weights),
+            self._pick(self.instances, self.instance_weights),
+            self._pick(self.srcaddrs, self.address_weights),
+            self._pick(self.dstaddrs, self.address_weights),
+            self.random.randint(1024, 65535),
+            self._pick(self.dstports, self.port_weights),
+            self.random.choice(PROTOCOLS),
+            packets,
+            packets * self.random.randint(40, 1500),
+            starttime,
+            starttime + self.random.randint(1, 600),
+            'ACCEPT' if self.random.random() < 0.8 else 'REJECT',
+            'OK',
+        ])
+
+    def write(self, path, rows):
+        with open(path, 'w', encoding='utf-8') as file:
+            for _ in range(rows):
+                file.write(self.line())
+                file.write('\n')
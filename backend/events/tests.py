@@ -1,3 +1,520 @@
-from django.test import TestCase
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from io import StringIO
+from unittest import mock
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase, override_settings
+from . import subscriptions
+from .models import Account, ColumnStatistic, Event, UploadedFile
+from .planner import HISTOGRAM_BUCKETS, INDEX_NAMES, bucket_key, plan_search
+from .management.commands.benchmark import Command as BenchmarkCommand, percentile
+from .serializers import EventSerializer
+from .synthetic import FlowLogGenerator
+from .views import iter_events, parse_and_save_events
 
-# Create your tests here.
+
+def write_log(directory, name, lines):
+    path = os.path.join(directory, name)
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write('\n'.join(lines) + '\n')
+    return path
+
+
+def flow_line(serialno, action='ACCEPT', log_status='OK', starttime=1725850449,
+              account='348935949', srcaddr='159.62.125.136', dstport=23475):
+    return (
+        f"{serialno}|2|{account}|eni-293216456|{srcaddr}|30.55.177.194|152|{dstport}|6|10|3929334|"
+        f"{starttime}|{starttime + 60}|{action}|{log_status}"
+    )
+
+
+class TempDirMixin:
+    def setUp(self):
+        super().setUp()
+        self.temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temp_dir)
+
+
+class ParseEventsTests(TempDirMixin, TestCase):
+    def test_unknown_action_and_log_status_are_stored_as_none(self):
+        path = write_log(self.temp_dir, 'events.log', [
+            flow_line(1, 'ACCEPT'),
+            flow_line(2, 'reject'),
+            flow_line(3, '-', '-'),
+            flow_line(4, 'DROP', 'PARTIAL'),
+            flow_line(5, 'ACCEPT', 'NODATA'),
+        ])
+        file_record = UploadedFile.objects.create(filename='events.log', file_path=path)
+
+        self.assertEqual(parse_and_save_events(path, file_record), 5)
+        stored = dict(Event.objects.values_list('serialno', 'action'))
+        self.assertEqual(stored, {
+            1: Event.Action.ACCEPT,
+            2: Event.Action.REJECT,
+            3: Event.Action.NONE,
+            4: Event.Action.NONE,
+            5: Event.Action.ACCEPT,
+        })
+        self.assertEqual(Event.objects.get(serialno=4).log_status, Event.LogStatus.NONE)
+        self.assertEqual(Event.objects.get(serialno=5).log_status, Event.LogStatus.NODATA)
+
+
+class CompactLayoutMigrationTests(TransactionTestCase):
+    migrate_from = [('events', '0001_initial')]
+
+    def setUp(self):
+        executor = MigrationExecutor(connection)
+        self.migrate_to = executor.loader.graph.leaf_nodes('events')
+        executor.migrate(self.migrate_from)
+        self.old_apps = executor.loader.project_state(self.migrate_from).apps
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.migrate_to)
+
+    def migrate(self):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(self.migrate_to)
+
+    def test_rows_are_re_encoded(self):
+        OldEvent = self.old_apps.get_model('events', 'Event')
+        OldUploadedFile = self.old_apps.get_model('events', 'UploadedFile')
+        older = OldUploadedFile.objects.create(filename='a.log', file_path='uploads/a.log')
+        newer = OldUploadedFile.objects.create(filename='a.log', file_path='uploads/a_2.log')
+        rows = [
+            ('111', 'eni-1', 'accept', 'ok', 'a.log'),
+            ('222', 'eni-2', 'REJECT', 'NoData', 'a.log'),
+            ('111', 'eni-1', '-', 'SKIPDATA', 'orphan.log'),
+            ('333', 'eni-3', 'DROP', 'weird', 'orphan.log'),
+        ]
+        for serialno, (account, instance, action, log_status, source_file) in enumerate(rows):
+            OldEvent.objects.create(
+                serialno=serialno, version=2, account_id=account, instance_id=instance,
+                srcaddr='10.0.0.1', dstaddr='10.0.0.2', srcport=1024, dstport=443,
+                protocol=6, packets=1, bytes=100, starttime=1725850449 + serialno,
+                endtime=1725850509, action=action, log_status=log_status,
+                source_file=source_file
+            )
+        old_ids = list(OldEvent.objects.order_by('serialno').values_list('id', flat=True))
+
+        self.migrate()
+
+        events = Event.objects.select_related('account', 'instance', 'source_file').order_by('serialno')
+        self.assertEqual([event.id for event in events], old_ids)
+        data = EventSerializer(events, many=True).data
+        self.assertEqual(
+            [(row['account_id'], row['instance_id'], row['action'], row['log_status'], row['source_file'])
+             for row in data],
+            [
+                ('111', 'eni-1', 'ACCEPT', 'OK', 'a.log'),
+                ('222', 'eni-2', 'REJECT', 'NODATA', 'a.log'),
+                ('111', 'eni-1', '-', 'SKIPDATA', 'orphan.log'),
+                ('333', 'eni-3', '-', '-', 'orphan.log'),
+            ]
+        )
+        # Duplicate filenames attach to the most recent upload
+        self.assertEqual(events[0].source_file_id, newer.id)
+        self.assertFalse(Event.objects.filter(source_file_id=older.id).exists())
+        # Files without an UploadedFile row get one
+        orphan = UploadedFile.objects.get(filename='orphan.log')
+        self.assertEqual(orphan.processing_status, 'completed')
+        self.assertEqual(orphan.events.count(), 2)
+
+
+class BulkIngestTests(TempDirMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        write_log(self.temp_dir, 'a.log', [flow_line(i, starttime=1725850000 + i) for i in range(5)])
+        write_log(self.temp_dir, 'b.log', [flow_line(i, 'REJECT', starttime=1725840000 + i) for i in range(3)])
+        write_log(self.temp_dir, 'README', ['These are flow logs'])
+
+    def assert_loaded(self, **options):
+        stdout = StringIO()
+        call_command('bulk_ingest', self.temp_dir, stdout=stdout, stderr=StringIO(), **options)
+
+        self.assertEqual(Event.objects.count(), 8)
+        self.assertEqual(
+            dict(UploadedFile.objects.values_list('filename', 'processing_status')),
+            {'a.log': 'completed', 'b.log': 'completed', 'README': 'failed'}
+        )
+        self.assertEqual(UploadedFile.objects.get(filename='a.log').total_events, 5)
+        self.assertIn('Skipped 1 files without events: README', stdout.getvalue())
+
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(cursor, Event._meta.db_table)
+        for index in Event._meta.indexes:
+            self.assertIn(index.name, constraints)
+            self.assertEqual(constraints[index.name]['columns'], [
+                Event._meta.get_field(field).column for field in index.fields
+            ])
+        # Merged in starttime order
+        self.assertEqual(
+            list(Event.objects.order_by('id').values_list('starttime', flat=True)),
+            sorted(Event.objects.values_list('starttime', flat=True))
+        )
+
+    def test_load_directory(self):
+        self.assert_loaded()
+
+    def test_load_directory_rebuilding_indexes(self):
+        self.assert_loaded(rebuild_indexes=True)
+
+
+HOUR_START = 1725850800  # on a TIME_BUCKET boundary
+
+
+class PlannerTests(TempDirMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        # Hour 1: 60 events, 50 from the hot address, 30 to port 443
+        # Hour 2: 40 events from another address to port 80
+        first_hour = [
+            flow_line(i, srcaddr='10.0.0.1' if i < 50 else '10.0.0.2',
+                      dstport=443 if i < 30 else 22, starttime=HOUR_START + i)
+            for i in range(60)
+        ]
+        second_hour = [
+            flow_line(i, srcaddr='10.0.0.3', dstport=80, starttime=HOUR_START + 3600 + i)
+            for i in range(40)
+        ]
+        for name, lines in [('a.log', first_hour), ('b.log', second_hour)]:
+            path = write_log(self.temp_dir, name, lines)
+            file_record = UploadedFile.objects.create(filename=name, file_path=path)
+            parse_and_save_events(path, file_record)
+
+    def search(self, **params):
+        params.setdefault('start_time', HOUR_START)
+        params.setdefault('end_time', HOUR_START + 7200)
+        return self.client.post('/api/search/', params, content_type='application/json')
+
+    def test_estimates_from_histograms(self):
+        plan = plan_search({'srcaddr': '10.0.0.1', 'start_time': HOUR_START, 'end_time': HOUR_START + 3600})
+        self.assertEqual(plan['total_rows'], 100)
+        self.assertEqual(plan['estimated_rows'], 30)  # 60 in range * 50/100 from the address
+        self.assertEqual(plan['index'], INDEX_NAMES['srcaddr'])
+
+        plan = plan_search({'dstport': 443, 'start_time': HOUR_START, 'end_time': HOUR_START + 7200})
+        self.assertEqual((plan['estimated_rows'], plan['estimated_cost']), (30, 30))
+        self.assertEqual(plan['index'], INDEX_NAMES['dstport'])
+
+        # Unselective filter: scan the time range; half a bucket is pro-rated
+        plan = plan_search({'action': 'accept', 'start_time': HOUR_START, 'end_time': HOUR_START + 1800})
+        self.assertEqual((plan['estimated_rows'], plan['estimated_cost']), (30, 30))
+        self.assertEqual(plan['index'], INDEX_NAMES['starttime'])
+
+        # Whole buckets inside a wider range are summed in the database
+        plan = plan_search({'action': 'accept', 'start_time': HOUR_START - 7200, 'end_time': HOUR_START + 14400})
+        self.assertEqual(plan['estimated_rows'], 100)
+
+    def test_bucket_keys(self):
+        self.assertEqual(bucket_key('10.0.0.1'), bucket_key('10.0.0.1'))
+        keys = {bucket_key(f'10.0.{i // 256}.{i % 256}') for i in range(5000)}
+        self.assertLessEqual(keys, set(range(HISTOGRAM_BUCKETS)))
+        self.assertGreater(len(keys), HISTOGRAM_BUCKETS * 0.9)
+
+    def test_histograms_stay_bounded(self):
+        path = write_log(self.temp_dir, 'c.log', [
+            flow_line(i, srcaddr=f'10.1.{i // 256}.{i % 256}', dstport=i, starttime=HOUR_START)
+            for i in range(3000)
+        ])
+        parse_and_save_events(path, UploadedFile.objects.create(filename='c.log', file_path=path))
+        self.assertLessEqual(ColumnStatistic.objects.filter(column_name='srcaddr').count(), HISTOGRAM_BUCKETS)
+
+    def test_ipv6_addresses_are_normalized(self):
+        path = write_log(self.temp_dir, 'c.log', [flow_line(1, srcaddr='2001:DB8:0::1', starttime=HOUR_START)])
+        parse_and_save_events(path, UploadedFile.objects.create(filename='c.log', file_path=path))
+
+        data = self.search(srcaddr='2001:db8::1').json()
+        self.assertEqual(data['total_count'], 1)
+        self.assertEqual(data['plan']['estimated_rows'], 1)
+
+        call_command('refresh_statistics', stdout=StringIO())
+        self.assertEqual(plan_search({'srcaddr': '2001:db8::1', 'start_time': HOUR_START, 'end_time': HOUR_START + 7200})['estimated_rows'], 1)
+
+    @override_settings(SEARCH_COST_BUDGET=50)
+    def test_rejects_search_over_budget(self):
+        response = self.search(action='ACCEPT')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['plan']['estimated_cost'], 100)
+
+        self.assertEqual(self.search(dstport=443).status_code, 200)
+
+    def test_exact_count_reports_actual_rows(self):
+        data = self.search(srcaddr='10.0.0.1').json()
+        self.assertFalse(data['count_is_estimate'])
+        self.assertEqual(data['total_count'], 50)
+        self.assertEqual(data['plan']['actual_rows'], 50)
+
+    @override_settings(SEARCH_EXACT_COUNT_LIMIT=10)
+    def test_switches_to_approximate_count(self):
+        data = self.search(srcaddr='10.0.0.1').json()
+        self.assertTrue(data['count_is_estimate'])
+        self.assertEqual(data['total_count'], data['plan']['estimated_rows'])
+        self.assertIsNone(data['plan']['actual_rows'])
+        self.assertEqual(data['files_searched'], ['a.log'])
+
+    def test_refresh_statistics_after_delete(self):
+        UploadedFile.objects.get(filename='b.log').delete()
+        self.assertEqual(plan_search({'action': 'ACCEPT', 'start_time': HOUR_START, 'end_time': HOUR_START + 7200})['total_rows'], 100)
+
+        call_command('refresh_statistics', stdout=StringIO())
+        plan = plan_search({'srcaddr': '10.0.0.3', 'start_time': HOUR_START, 'end_time': HOUR_START + 7200})
+        self.assertEqual(plan['total_rows'], 60)
+        self.assertEqual(plan['estimated_rows'], 0)
+
+    def test_failed_statistics_update_rolls_back_batch(self):
+        path = write_log(self.temp_dir, 'c.log', [flow_line(i) for i in range(5)])
+        file_record = UploadedFile.objects.create(filename='c.log', file_path=path)
+        stats_before = list(ColumnStatistic.objects.order_by('id').values_list('column_name', 'value', 'row_count'))
+
+        with mock.patch('events.views.update_statistics', side_effect=RuntimeError('boom')):
+            with self.assertRaises(Exception):
+                parse_and_save_events(path, file_record)
+        self.assertFalse(Event.objects.filter(source_file=file_record).exists())
+        self.assertEqual(list(ColumnStatistic.objects.order_by('id').values_list('column_name', 'value', 'row_count')), stats_before)
+
+
+class FlowLogGeneratorTests(TempDirMixin, TestCase):
+    def test_same_seed_same_lines(self):
+        first = FlowLogGenerator(seed=3, skew=1.2)
+        second = FlowLogGenerator(seed=3, skew=1.2)
+        lines = [first.line() for _ in range(100)]
+        self.assertEqual(lines, [second.line() for _ in range(100)])
+        self.assertNotEqual(lines, [FlowLogGenerator(seed=4, skew=1.2).line() for _ in range(100)])
+
+    def test_lines_parse(self):
+        path = os.path.join(self.temp_dir, 'flows.log')
+        FlowLogGenerator(seed=1, addresses=20, ports=5).write(path, 200)
+        file_record = UploadedFile.objects.create(filename='flows.log', file_path=path)
+
+        events = list(iter_events(path, file_record))
+        self.assertEqual(len(events), 200)
+        self.assertTrue(all(event.action in (Event.Action.ACCEPT, Event.Action.REJECT) for event in events))
+
+
+def benchmark_result(rows, p50, ingest=1000.0, status=200, count_is_estimate=False):
+    return {
+        'rows': rows,
+        'ingest_rows_per_sec': ingest,
+        'searches': {
+            'query': {
+                'status': status,
+                'count_is_estimate': count_is_estimate,
+                'p50_ms': p50,
+                'p99_ms': p50 * 2,
+            },
+        },
+    }
+
+
+class BenchmarkTests(TempDirMixin, TestCase):
+    def compare(self, results, baseline_results, tolerance=0.2):
+        path = os.path.join(self.temp_dir, 'baseline.json')
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump({'results': baseline_results}, file)
+        BenchmarkCommand(stdout=StringIO()).compare({'results': results}, path, tolerance)
+
+    def test_percentile(self):
+        samples = list(range(100, 0, -1))
+        self.assertEqual(percentile(samples, 0.5), 51)
+        self.assertEqual(percentile(samples, 0.99), 100)
+        self.assertEqual(percentile([7], 0.99), 7)
+
+    def test_within_tolerance_passes(self):
+        self.compare([benchmark_result(1000, 11.0)], [benchmark_result(1000, 10.0)])
+
+    def test_slowdown_is_flagged(self):
+        with self.assertRaisesRegex(CommandError, 'query p50_ms 13.0'):
+            self.compare([benchmark_result(1000, 13.0)], [benchmark_result(1000, 10.0)])
+        with self.assertRaisesRegex(CommandError, 'ingest 700.0'):
+            self.compare([benchmark_result(1000, 10.0, ingest=700.0)], [benchmark_result(1000, 10.0)])
+
+    def test_sizes_missing_from_baseline_are_skipped(self):
+        self.compare(
+            [benchmark_result(1000, 10.0), benchmark_result(5000, 500.0)],
+            [benchmark_result(1000, 10.0)]
+        )
+
+    def test_missing_ingest_rate_is_not_compared(self):
+        with self.assertRaisesRegex(CommandError, 'ingest not comparable \\(None rows/sec'):
+            self.compare([benchmark_result(1000, 10.0, ingest=None)], [benchmark_result(1000, 10.0)])
+        with self.assertRaisesRegex(CommandError, 'ingest not comparable'):
+            self.compare([benchmark_result(1000, 10.0)], [benchmark_result(1000, 10.0, ingest=None)])
+
+    def test_ingest_rate_covers_rows_added_at_each_size(self):
+        # 2 files of 10 rows take 1s each, then 3 files take 2s each
+        clock = iter([0, 1, 1, 2, 2, 4, 4, 6, 6, 8])
+        with mock.patch('events.management.commands.benchmark.time.perf_counter', lambda: next(clock)):
+            results = BenchmarkCommand(stdout=StringIO()).run_sizes(
+                [20, 50], FlowLogGenerator(seed=0), {}, self.temp_dir, {'file_rows': 10, 'repeat': 1}
+            )
+        self.assertEqual([result['rows'] for result in results], [20, 50])
+        self.assertEqual([result['ingest_rows_per_sec'] for result in results], [10.0, 5.0])
+
+    def test_failed_or_estimated_searches_are_not_compared(self):
+        with self.assertRaisesRegex(CommandError, 'not comparable \\(status 400'):
+            self.compare([benchmark_result(1000, 2.0, status=400)], [benchmark_result(1000, 10.0)])
+        with self.assertRaisesRegex(CommandError, 'not comparable \\(count_is_estimate'):
+            self.compare([benchmark_result(1000, 2.0, count_is_estimate=True)], [benchmark_result(1000, 10.0)])
+
+
+class SubscriptionTests(TempDirMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        subscriptions._subscriptions.clear()
+        self.addCleanup(subscriptions._subscriptions.clear)
+        self.file_count = 0
+
+    def ingest(self, lines):
+        self.file_count += 1
+        path = write_log(self.temp_dir, f'{self.file_count}.log', lines)
+        file_record = UploadedFile.objects.create(filename=f'{self.file_count}.log', file_path=path)
+        with self.captureOnCommitCallbacks(execute=True):
+            parse_and_save_events(path, file_record)
+
+    def test_matches_agrees_with_search(self):
+        self.ingest([
+            flow_line(1, 'ACCEPT', account='AcMe-1', starttime=HOUR_START),
+            flow_line(2, 'REJECT', account='AcMe-1', starttime=HOUR_START + 10),
+            flow_line(3, 'REJECT', account='other', starttime=HOUR_START + 20),
+            flow_line(4, 'reject', account='ACME-2', srcaddr='10.0.0.9', starttime=HOUR_START + 500),
+            flow_line(5, 'ACCEPT', account='other', srcaddr='10.0.0.9', starttime=HOUR_START + 5000),
+            flow_line(6, 'ACCEPT', account='other', srcaddr='2001:DB8:0::1', starttime=HOUR_START + 30),
+        ])
+        account_values = {
+            account.id: account.value.lower() for account in Account.objects.all()
+        }
+        window = {'start_time': HOUR_START, 'end_time': HOUR_START + 3600}
+        for filters in [
+            {'account_id': 'acme', **window},
+            {'action': 'rej', **window},
+            {'action': 'REJECT', 'start_time': HOUR_START + 5, 'end_time': HOUR_START + 100},
+            {'account_id': 'ACME', 'srcaddr': '10.0.0.9', **window},
+            {'srcaddr': '10.0.0.9', 'start_time': HOUR_START, 'end_time': HOUR_START + 7200},
+            {'srcaddr': '2001:db8::1', **window},
+            {'srcaddr': '2001:DB8::0:1', **window},
+        ]:
+            subscription = subscriptions.Subscription(filters, 0)
+            matched = {event.id for event in Event.objects.all() if subscription.matches(event, account_values)}
+            response = self.client.post('/api/search/', filters, content_type='application/json')
+            searched = {event['id'] for event in response.json()['events']}
+            self.assertEqual(matched, searched, filters)
+            self.assertTrue(matched, filters)
+
+    def test_only_events_after_registration(self):
+        self.ingest([flow_line(1, 'ACCEPT')])
+        subscription = subscriptions.register({'action': 'ACCEPT'})
+        self.ingest([flow_line(2, 'ACCEPT'), flow_line(3, 'REJECT')])
+
+        event_ids = subscriptions.wait_for_events(subscription, None, 0)
+        self.assertEqual(event_ids, list(Event.objects.filter(serialno=2).values_list('id', flat=True)))
+
+    def test_batch_published_while_registering_is_delivered(self):
+        self.ingest([flow_line(1, 'ACCEPT')])
+        aggregate = Event.objects.aggregate
+        publishers = []
+
+        def commit_batch_during_registration(*args, **kwargs):
+            # A batch commits right after the high-water mark is read, and its
+            # on_commit publish runs before registration completes
+            result = aggregate(*args, **kwargs)
+            self.file_count += 1
+            path = write_log(self.temp_dir, f'{self.file_count}.log', [flow_line(2, 'ACCEPT')])
+            file_record = UploadedFile.objects.create(filename=f'{self.file_count}.log', file_path=path)
+            with self.captureOnCommitCallbacks() as callbacks:
+                parse_and_save_events(path, file_record)
+            publisher = threading.Thread(target=callbacks[0])
+            publisher.start()
+            publisher.join(0.2)
+            publishers.append(publisher)
+            return result
+
+        with mock.patch.object(Event.objects, 'aggregate', commit_batch_during_registration):
+            subscription = subscriptions.register({'action': 'ACCEPT'})
+        publishers[0].join(5)
+
+        self.assertEqual(
+            subscriptions.wait_for_events(subscription, None, 0),
+            [Event.objects.get(serialno=2).id]
+        )
+
+    def test_acknowledge_limit_and_timeout(self):
+        subscription = subscriptions.register({'action': 'ACCEPT'})
+        self.ingest([flow_line(i, 'ACCEPT') for i in range(5)])
+        ids = list(Event.objects.order_by('id').values_list('id', flat=True))
+
+        self.assertEqual(subscriptions.wait_for_events(subscription, None, 0, limit=2), ids[:2])
+        self.assertEqual(subscriptions.wait_for_events(subscription, None, 0), ids)
+        self.assertEqual(subscriptions.wait_for_events(subscription, ids[2], 0), ids[3:])
+        # Acknowledged ids are not redelivered
+        self.assertEqual(subscriptions.wait_for_events(subscription, None, 0), ids[3:])
+
+        started = time.monotonic()
+        self.assertEqual(subscriptions.wait_for_events(subscription, ids[-1], 0.1), [])
+        self.assertGreaterEqual(time.monotonic() - started, 0.1)
+
+    @override_settings(SUBSCRIPTION_BUFFER_SIZE=3)
+    def test_buffer_overflow_counts_dropped(self):
+        subscription = subscriptions.register({'action': 'ACCEPT'})
+        self.ingest([flow_line(i, 'ACCEPT') for i in range(5)])
+        ids = list(Event.objects.order_by('id').values_list('id', flat=True))
+
+        self.assertEqual(subscriptions.wait_for_events(subscription, None, 0), ids[2:])
+        self.assertEqual(subscription.dropped, 2)
+
+    def test_long_poll_wakes_on_ingest(self):
+        subscription = subscriptions.register({'action': 'REJECT'})
+        result = {}
+
+        def poll():
+            result['ids'] = subscriptions.wait_for_events(subscription, None, 5)
+
+        poller = threading.Thread(target=poll)
+        poller.start()
+        time.sleep(0.1)
+        self.ingest([flow_line(1, 'ACCEPT'), flow_line(2, 'REJECT')])
+        poller.join(5)
+
+        self.assertFalse(poller.is_alive())
+        self.assertEqual(result['ids'], [Event.objects.get(serialno=2).id])
+
+    def test_poll_endpoint(self):
+        response = self.client.post('/api/subscriptions/', {'action': 'REJECT'}, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        subscription_id = response.json()['id']
+        self.ingest([flow_line(1, 'REJECT', account='AcMe-1')])
+
+        data = self.client.get(f'/api/subscriptions/{subscription_id}/?timeout=0').json()
+        self.assertEqual([event['account_id'] for event in data['events']], ['AcMe-1'])
+        self.assertEqual(data['high_water_mark'], Event.objects.get().id)
+
+        data = self.client.get(f'/api/subscriptions/{subscription_id}/?timeout=0&after={data["high_water_mark"]}').json()
+        self.assertEqual(data['events'], [])
+
+        self.assertEqual(self.client.delete(f'/api/subscriptions/{subscription_id}/').status_code, 204)
+        self.assertEqual(self.client.get(f'/api/subscriptions/{subscription_id}/').status_code, 404)
+
+    @override_settings(SUBSCRIPTION_MAX=1)
+    def test_subscription_limit(self):
+        first = self.client.post('/api/subscriptions/', {'action': 'ACCEPT'}, content_type='application/json')
+        self.assertEqual(first.status_code, 201)
+        second = self.client.post('/api/subscriptions/', {'action': 'ACCEPT'}, content_type='application/json')
+        self.assertEqual(second.status_code, 503)
+
+        # Once the first goes idle it is expired and makes room
+        subscriptions.get(first.json()['id']).last_seen -= 1000
+        third = self.client.post('/api/subscriptions/', {'action': 'ACCEPT'}, content_type='application/json')
+        self.assertEqual(third.status_code, 201)
+
+    def test_idle_subscriptions_expire_without_ingest(self):
+        subscription = subscriptions.register({'action': 'ACCEPT'})
+        subscription.last_seen -= 1000
+        self.assertIsNone(subscriptions.get(subscription.id))
+        self.assertNotIn(subscription.id, subscriptions._subscriptions)
@@ -4,6 +4,9 @@ from . import views
 urlpatterns = [
     path('upload/', views.upload_files, name='upload_files'),
     path('search/', views.search_events, name='search_events'),
+    path('subscriptions/', views.create_subscription, name='create_subscription'),
+    path('subscriptions/<str:subscription_id>/', views.subscription_events, name='subscription_events'),
+    path('subscriptions/<str:subscription_id>/stream/', views.subscription_stream, name='subscription_stream'),
     path('files/', views.get_uploaded_files, name='get_uploaded_files'),
     path('health/', views.health_check, name='health_check'),
 ]
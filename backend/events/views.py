@@ -1,22 +1,36 @@
 import os
+import json
 import time
 import csv
 import pandas as pd
 from django.shortcuts import render
 from django.conf import settings
+from django.db import transaction
 from django.db.models import Q
+from django.http import Http404, StreamingHttpResponse
+from django.views.decorators.http import require_GET
 from rest_framework import status
 from rest_framework.decorators import api_view, parser_classes
 from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework.response import Response
 from django.core.files.storage import default_storage
 from django.core.files.base import ContentFile
-from .models import Event, UploadedFile
+from . import subscriptions
+from .models import Account, Event, Instance, UploadedFile
+from .planner import (
+    exceeds_budget,
+    matching_codes,
+    normalize_address,
+    plan_search,
+    update_statistics,
+    use_approximate_count
+)
 from .serializers import (
     EventSerializer,
     UploadedFileSerializer,
     SearchRequestSerializer,
-    SearchResponseSerializer
+    SearchResponseSerializer,
+    SubscriptionRequestSerializer
 )
 
 
@@ -53,7 +67,7 @@ def upload_files(request):
             # Parse and save events
             events_count = parse_and_save_events(
                 os.path.join(settings.MEDIA_ROOT, file_path),
-                uploaded_file.name
+                file_record
             )
             
             # Update file record
@@ -85,7 +99,100 @@ def upload_files(request):
     })
 
 
-def parse_and_save_events(file_path, source_filename):
+def _lookup_id(model, cache, value):
+    """
+    Return the dictionary key for value, creating the entry on first sight
+    """
+    if value not in cache:
+        cache[value] = model.objects.get_or_create(value=value)[0].pk
+    return cache[value]
+
+
+def _choice_code(choices, value):
+    """
+    Map a log string (e.g. 'ACCEPT') to its stored integer code; '-' and
+    unrecognised values are kept as NONE, matching migration 0002
+    """
+    try:
+        return choices[value.upper()]
+    except KeyError:
+        return choices.NONE
+
+
+def iter_events(file_path, file_record):
+    """
+    Parse event file and yield unsaved Event objects, skipping invalid rows
+    """
+    account_ids = {}
+    instance_ids = {}
+
+    # Try to read as CSV first
+    with open(file_path, 'r', encoding='utf-8') as file:
+        # Skip the header line if it exists
+        first_line = file.readline().strip()
+        
+        # Detect delimiter (pipe or space)
+        delimiter = '|' if '|' in first_line else ' '
+        
+        if 'serialno' in first_line.lower():
+            # Has header, reset to beginning and use pandas
+            file.seek(0)
+            df = pd.read_csv(file, delimiter=delimiter, sep=delimiter if delimiter == ' ' else None)
+        else:
+            # No header, define columns and read
+            file.seek(0)
+            columns = [
+                'serialno', 'version', 'account_id', 'instance_id',
+                'srcaddr', 'dstaddr', 'srcport', 'dstport', 'protocol',
+                'packets', 'bytes', 'starttime', 'endtime', 'action', 'log_status'
+            ]
+            if delimiter == ' ':
+                df = pd.read_csv(file, delimiter=r'\s+', names=columns, engine='python')
+            else:
+                df = pd.read_csv(file, delimiter=delimiter, names=columns)
+    
+    # Clean column names (remove spaces and special characters)
+    df.columns = df.columns.str.strip().str.replace('-', '_')
+    
+    # Process each row
+    for _, row in df.iterrows():
+        try:
+            event = Event(
+                serialno=int(row['serialno']),
+                version=int(row['version']),
+                account_id=_lookup_id(Account, account_ids, str(row['account_id']).strip()),
+                instance_id=_lookup_id(Instance, instance_ids, str(row['instance_id']).strip()),
+                srcaddr=normalize_address(str(row['srcaddr']).strip()),
+                dstaddr=normalize_address(str(row['dstaddr']).strip()),
+                srcport=int(row['srcport']),
+                dstport=int(row['dstport']),
+                protocol=int(row['protocol']),
+                packets=int(row['packets']),
+                bytes=int(row['bytes']),
+                starttime=int(row['starttime']),
+                endtime=int(row['endtime']),
+                action=_choice_code(Event.Action, str(row['action']).strip()),
+                log_status=_choice_code(Event.LogStatus, str(row['log_status']).strip()),
+                source_file=file_record
+            )
+        except (ValueError, KeyError) as e:
+            # Skip invalid rows
+            continue
+        yield event
+
+
+def save_events(events):
+    """
+    Insert a batch of events, update statistics and notify live subscriptions
+    """
+    # Events and their histogram counts commit together
+    with transaction.atomic():
+        Event.objects.bulk_create(events)
+        update_statistics(events)
+        transaction.on_commit(lambda: subscriptions.publish(events))
+
+
+def parse_and_save_events(file_path, file_record):
     """
     Parse event file and save events to database
     """
@@ -94,73 +201,21 @@ def parse_and_save_events(file_path, source_filename):
     events_batch = []
     
     try:
-        # Try to read as CSV first
-        with open(file_path, 'r', encoding='utf-8') as file:
-            # Skip the header line if it exists
-            first_line = file.readline().strip()
-            
-            # Detect delimiter (pipe or space)
-            delimiter = '|' if '|' in first_line else ' '
+        for event in iter_events(file_path, file_record):
+            events_batch.append(event)
+            events_count += 1
             
-            if 'serialno' in first_line.lower():
-                # Has header, reset to beginning and use pandas
-                file.seek(0)
-                df = pd.read_csv(file, delimiter=delimiter, sep=delimiter if delimiter == ' ' else None)
-            else:
-                # No header, define columns and read
-                file.seek(0)
-                columns = [
-                    'serialno', 'version', 'account_id', 'instance_id',
-                    'srcaddr', 'dstaddr', 'srcport', 'dstport', 'protocol',
-                    'packets', 'bytes', 'starttime', 'endtime', 'action', 'log_status'
-                ]
-                if delimiter == ' ':
-                    df = pd.read_csv(file, delimiter=r'\s+', names=columns, engine='python')
-                else:
-                    df = pd.read_csv(file, delimiter=delimiter, names=columns)
-        
-        # Clean column names (remove spaces and special characters)
-        df.columns = df.columns.str.strip().str.replace('-', '_')
-        
-        # Process each row
-        for _, row in df.iterrows():
-            try:
-                event = Event(
-                    serialno=int(row['serialno']),
-                    version=int(row['version']),
-                    account_id=str(row['account_id']).strip(),
-                    instance_id=str(row['instance_id']).strip(),
-                    srcaddr=str(row['srcaddr']).strip(),
-                    dstaddr=str(row['dstaddr']).strip(),
-                    srcport=int(row['srcport']),
-                    dstport=int(row['dstport']),
-                    protocol=int(row['protocol']),
-                    packets=int(row['packets']),
-                    bytes=int(row['bytes']),
-                    starttime=int(row['starttime']),
-                    endtime=int(row['endtime']),
-                    action=str(row['action']).strip(),
-                    log_status=str(row['log_status']).strip(),
-                    source_file=source_filename
-                )
-                events_batch.append(event)
-                events_count += 1
-                
-                # Save batch when it reaches batch_size
-                if len(events_batch) >= batch_size:
-                    Event.objects.bulk_create(events_batch)
-                    events_batch = []
-                    
-            except (ValueError, KeyError) as e:
-                # Skip invalid rows
-                continue
+            # Save batch when it reaches batch_size
+            if len(events_batch) >= batch_size:
+                save_events(events_batch)
+                events_batch = []
         
         # Save remaining events
         if events_batch:
-            Event.objects.bulk_create(events_batch)
+            save_events(events_batch)
     
     except Exception as e:
-        raise Exception(f"Error parsing file {source_filename}: {str(e)}")
+        raise Exception(f"Error parsing file {file_record.filename}: {str(e)}")
     
     return events_count
 
@@ -183,7 +238,7 @@ def search_events(request):
     
     # Add search filters
     if search_params.get('account_id'):
-        query &= Q(account_id__icontains=search_params['account_id'])
+        query &= Q(account__in=Account.objects.filter(value__icontains=search_params['account_id']))
     
     if search_params.get('srcaddr'):
         query &= Q(srcaddr=search_params['srcaddr'])
@@ -201,10 +256,10 @@ def search_events(request):
         query &= Q(protocol=search_params['protocol'])
     
     if search_params.get('action'):
-        query &= Q(action__icontains=search_params['action'])
+        query &= Q(action__in=matching_codes(Event.Action, search_params['action']))
     
     if search_params.get('log_status'):
-        query &= Q(log_status__icontains=search_params['log_status'])
+        query &= Q(log_status__in=matching_codes(Event.LogStatus, search_params['log_status']))
     
     # Add time range filters
     if search_params.get('start_time'):
@@ -213,17 +268,43 @@ def search_events(request):
     if search_params.get('end_time'):
         query &= Q(endtime__lte=search_params['end_time'])
     
-    # Execute query
-    events = Event.objects.filter(query).order_by('-starttime')[:1000]  # Limit results
-    total_count = Event.objects.filter(query).count()
+    # Estimate cost from column statistics before touching the table
+    plan = plan_search(search_params)
+    if exceeds_budget(plan):
+        return Response(
+            {
+                'error': f"Search would scan about {plan['estimated_cost']} events; "
+                         "narrow the time range or add more specific filters",
+                'plan': plan
+            },
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    approximate_count = use_approximate_count(plan)
     
-    # Get unique source files
-    files_searched = list(
+    # Execute query
+    events = (
         Event.objects.filter(query)
-        .values_list('source_file', flat=True)
-        .distinct()
+        .select_related('account', 'instance', 'source_file')
+        .order_by('-starttime')[:1000]  # Limit results
     )
     
+    if approximate_count:
+        # Too many matches for an exact count/distinct scan; report the
+        # estimate and the files behind the returned page only
+        total_count = plan['estimated_rows']
+        files_searched = list(dict.fromkeys(event.source_file.filename for event in events))
+        plan['actual_rows'] = None
+    else:
+        total_count = Event.objects.filter(query).count()
+        
+        # Get unique source files
+        files_searched = list(
+            Event.objects.filter(query)
+            .values_list('source_file__filename', flat=True)
+            .distinct()
+        )
+        plan['actual_rows'] = total_count
+    
     # Calculate search time
     search_time = time.time() - start_time
     
@@ -234,12 +315,114 @@ def search_events(request):
         'events': events_data,
         'total_count': total_count,
         'search_time': round(search_time, 3),
-        'files_searched': files_searched
+        'files_searched': files_searched,
+        'count_is_estimate': approximate_count,
+        'plan': plan
     }
     
     return Response(response_data)
 
 
+def _subscription_events(event_ids):
+    events = (
+        Event.objects.filter(id__in=event_ids)
+        .select_related('account', 'instance', 'source_file')
+        .order_by('id')
+    )
+    return EventSerializer(events, many=True).data
+
+
+@api_view(['POST'])
+def create_subscription(request):
+    """
+    Register a search filter for live tail of newly ingested events
+    """
+    serializer = SubscriptionRequestSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        subscription = subscriptions.register(serializer.validated_data)
+    except subscriptions.SubscriptionLimitReached as e:
+        return Response({'error': str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+    return Response(
+        {
+            'id': subscription.id,
+            'high_water_mark': subscription.high_water_mark
+        },
+        status=status.HTTP_201_CREATED
+    )
+
+
+@api_view(['GET', 'DELETE'])
+def subscription_events(request, subscription_id):
+    """
+    Long-poll for events matching a subscription.
+
+    Pass ?after=<high_water_mark> from the previous response to acknowledge
+    what was already received; the call returns as soon as newer matches
+    exist or after ?timeout= seconds with an empty list.
+    """
+    subscription = subscriptions.get(subscription_id)
+    if subscription is None:
+        return Response({'error': 'Subscription not found'}, status=status.HTTP_404_NOT_FOUND)
+    
+    if request.method == 'DELETE':
+        subscriptions.unregister(subscription_id)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+    
+    try:
+        after = int(request.query_params['after']) if 'after' in request.query_params else None
+        timeout = float(request.query_params.get('timeout', settings.SUBSCRIPTION_POLL_TIMEOUT))
+    except ValueError:
+        return Response(
+            {'error': 'after and timeout must be numbers'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    timeout = max(0, min(timeout, settings.SUBSCRIPTION_POLL_TIMEOUT))
+    
+    event_ids = subscriptions.wait_for_events(subscription, after, timeout)
+    return Response({
+        'events': _subscription_events(event_ids),
+        'high_water_mark': event_ids[-1] if event_ids else subscription.high_water_mark,
+        'dropped': subscription.dropped
+    })
+
+
+@require_GET
+def subscription_stream(request, subscription_id):
+    """
+    Server-Sent Events stream for a subscription; each message carries its
+    high water mark as the event id, so reconnects resume via Last-Event-ID
+    """
+    subscription = subscriptions.get(subscription_id)
+    if subscription is None:
+        raise Http404('Subscription not found')
+    
+    last_event_id = request.headers.get('Last-Event-ID')
+    after = int(last_event_id) if last_event_id and last_event_id.isdigit() else None
+    
+    def stream():
+        nonlocal after
+        while subscriptions.get(subscription_id) is not None:
+            event_ids = subscriptions.wait_for_events(
+                subscription, after, settings.SUBSCRIPTION_POLL_TIMEOUT
+            )
+            if not event_ids:
+                yield ': keep-alive\n\n'
+                continue
+            after = event_ids[-1]
+            data = json.dumps({
+                'events': _subscription_events(event_ids),
+                'dropped': subscription.dropped
+            })
+            yield f'id: {after}\ndata: {data}\n\n'
+    
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+
 @api_view(['GET'])
 def get_uploaded_files(request):
     """
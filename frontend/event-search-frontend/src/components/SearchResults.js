@@ -11,7 +11,7 @@ const SearchResults = ({ results }) => {
     return null;
   }
 
-  const { events, total_count, search_time, files_searched } = results;
+  const { events, total_count, search_time, files_searched, count_is_estimate } = results;
 
   if (events.length === 0) {
     return (
@@ -84,7 +84,7 @@ const SearchResults = ({ results }) => {
           <h5 className="mb-0">Search Results</h5>
           <div className="text-muted">
             <small>
-              Found {total_count} event{total_count !== 1 ? 's' : ''} • 
+              Found {count_is_estimate ? '~' : ''}{total_count} event{total_count !== 1 ? 's' : ''} • 
               Search Time: {search_time}s
             </small>
           </div>